@@ -1,6 +1,6 @@
 """
-CodebaseAssistant: wraps a ConversationalRetrievalChain over
-the indexed Chroma vector store, powered by Docker Model Runner.
+CodebaseAssistant: conversational retrieval-augmented QA over
+the indexed FAISS vector store, powered by Docker Model Runner.
 
 Docker Model Runner exposes an OpenAI-compatible REST API at:
   http://model-runner.docker.internal/engines/llama.cpp/v1  (inside container)
@@ -12,9 +12,13 @@ Setup (no Docker Compose, no Ollama needed):
 """
 
 import os
-from typing import Optional
+from typing import AsyncIterator, Optional
+
+import faiss
+import numpy as np
 from langchain_openai import ChatOpenAI
-from langchain.chains import ConversationalRetrievalChain
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
 from langchain.prompts import (
     PromptTemplate,
     ChatPromptTemplate,
@@ -31,6 +35,16 @@ DOCKER_MODEL_BASE_URL = os.getenv(
 # Must match the model you pulled: docker model pull ai/llama3.2
 DOCKER_MODEL_NAME = os.getenv("DOCKER_MODEL_NAME", "ai/llama3.2")
 
+# Minimum cosine similarity of the best chunk for a question to be answerable.
+# Same cut-off as the old squared-L2 distance of 1.5 on normalized vectors
+# (d² = 2 - 2·cos  →  cos = 0.25).
+MIN_RELEVANCE = 0.25
+
+# Questions at least this similar to an earlier one reuse its answer.
+CACHE_SIMILARITY = 0.92
+# Answers kept in the semantic cache; the oldest is evicted beyond this.
+CACHE_MAX_ENTRIES = 1000
+
 # ── Prompts ───────────────────────────────────────────────────────────────────
 SYSTEM_PROMPT = """You are a codebase analysis assistant. You answer questions STRICTLY based on the code snippets provided in the context below.
 
@@ -58,6 +72,10 @@ Standalone question:"""
 )
 
 
+def _format_history(pairs: list) -> str:
+    return "\n".join(f"Human: {human}\nAssistant: {ai}" for human, ai in pairs)
+
+
 class CodebaseAssistant:
     def __init__(self, indexer):
         self.indexer = indexer
@@ -68,64 +86,93 @@ class CodebaseAssistant:
             base_url=DOCKER_MODEL_BASE_URL,
             api_key="docker-model-runner",  # required field but not validated
             temperature=0,
-            streaming=False,
-        )
-        self._chain: Optional[ConversationalRetrievalChain] = None
-
-    def _build_chain(self) -> ConversationalRetrievalChain:
-        vs = self.indexer.get_vectorstore()
-        retriever = vs.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": 8},
+            streaming=True,
         )
+        self._condense_chain = CONDENSE_PROMPT | self._llm | StrOutputParser()
+        self._chain: Optional[Runnable] = None
+        self._vs = None
+        self._reset_cache()
+
+    def _reset_cache(self):
+        """Semantic cache: question embeddings → previous answers."""
+        dim = self.indexer._embeddings.model.get_sentence_embedding_dimension()
+        # Ids increase monotonically, so the dict's insertion order is oldest first
+        self._cache_index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+        self._cache_entries: dict = {}
+        self._cache_next_id = 0
+
+    def _build_chain(self) -> Runnable:
+        self._vs = self.indexer.get_vectorstore()
 
         qa_prompt = ChatPromptTemplate.from_messages([
             SystemMessagePromptTemplate.from_template(SYSTEM_PROMPT),
             HumanMessagePromptTemplate.from_template("{question}"),
         ])
 
-        return ConversationalRetrievalChain.from_llm(
-            llm=self._llm,
-            retriever=retriever,
-            condense_question_prompt=CONDENSE_PROMPT,
-            combine_docs_chain_kwargs={"prompt": qa_prompt},
-            return_source_documents=True,
-            verbose=False,
-        )
+        return qa_prompt | self._llm | StrOutputParser()
 
-    async def query(self, question: str, chat_history: list = []) -> dict:
-        """Run a question against the indexed codebase."""
+    async def query(self, question: str, chat_history: list = []) -> AsyncIterator[dict]:
+        """
+        Run a question against the indexed codebase, streaming events:
+        {"type": "token", "content": ...} as the answer is generated,
+        then one {"type": "sources", "sources": [...]}.
+        """
         if self._chain is None:
             self._chain = self._build_chain()
 
-        # Sanity-check: do a direct similarity search with scores first.
-        # FAISS returns (doc, score) where lower L2 distance = more relevant.
-        vs = self.indexer.get_vectorstore()
-        scored = vs.similarity_search_with_score(question, k=4)
-
-        # If the best match score is too high (far away), nothing relevant exists.
-        # L2 distance > 1.5 means the query is semantically unrelated to all chunks.
-        if scored and scored[0][1] > 1.5:
-            return {
-                "answer": "I could not find relevant information in the indexed codebase to answer this question. The actual files may not contain this information, or try re-indexing the project.",
-                "sources": [],
-            }
-
         # Convert [{role, content}] → [(human, ai)] tuples for LangChain
-        lc_history = []
-        for i in range(0, len(chat_history) - 1, 2):
-            human = chat_history[i].get("content", "")
-            ai = chat_history[i + 1].get("content", "") if i + 1 < len(chat_history) else ""
-            lc_history.append((human, ai))
-
-        result = await self._chain.acall({
+        # (a trailing unanswered message has no partner and is dropped by zip)
+        lc_history = [
+            (human.get("content", ""), ai.get("content", ""))
+            for human, ai in zip(chat_history[0::2], chat_history[1::2])
+        ]
+
+        # Follow-ups are rephrased into a standalone question before retrieval.
+        if lc_history:
+            question = await self._condense_chain.ainvoke({
+                "question": question,
+                "chat_history": _format_history(lc_history),
+            })
+
+        # Embed the question once and reuse the vector for the cache,
+        # the relevance check and retrieval.
+        qvec = self.indexer._embeddings.embed_query(question)
+
+        # Follow-up questions depend on the conversation, so only standalone
+        # questions go through the semantic cache.
+        cacheable = not lc_history
+        if cacheable and self._cache_index.ntotal:
+            sims, idx = self._cache_index.search(np.asarray([qvec], dtype="float32"), 1)
+            if sims[0][0] >= CACHE_SIMILARITY:
+                cached = self._cache_entries[idx[0][0]]
+                yield {"type": "token", "content": cached["answer"]}
+                yield {"type": "sources", "sources": cached["sources"]}
+                return
+
+        # One search serves both the relevance check and the answer context.
+        # FAISS returns (doc, score) where higher cosine similarity = more relevant.
+        scored = self._vs.similarity_search_with_score_by_vector(qvec, k=8)
+
+        # If the best match is below the cut-off, nothing relevant exists.
+        if scored and scored[0][1] < MIN_RELEVANCE:
+            yield {"type": "token", "content": "I could not find relevant information in the indexed codebase to answer this question. The actual files may not contain this information, or try re-indexing the project."}
+            yield {"type": "sources", "sources": []}
+            return
+
+        docs = [doc for doc, _ in scored]
+
+        answer = []
+        async for token in self._chain.astream({
+            "context": "\n\n".join(doc.page_content for doc in docs),
             "question": question,
-            "chat_history": lc_history,
-        })
+        }):
+            if token:
+                answer.append(token)
+                yield {"type": "token", "content": token}
 
         sources = []
         seen = set()
-        for doc in result.get("source_documents", []):
+        for doc in docs:
             src = doc.metadata.get("source", "unknown")
             fname = doc.metadata.get("filename", src)
             if src not in seen:
@@ -135,9 +182,22 @@ class CodebaseAssistant:
                     "path": src,
                     "preview": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
                 })
-
-        return {"answer": result["answer"], "sources": sources}
+        yield {"type": "sources", "sources": sources}
+
+        if cacheable:
+            if len(self._cache_entries) >= CACHE_MAX_ENTRIES:
+                oldest = next(iter(self._cache_entries))
+                self._cache_index.remove_ids(np.array([oldest], dtype="int64"))
+                del self._cache_entries[oldest]
+            cache_id = self._cache_next_id
+            self._cache_next_id += 1
+            self._cache_index.add_with_ids(
+                np.asarray([qvec], dtype="float32"), np.array([cache_id], dtype="int64")
+            )
+            self._cache_entries[cache_id] = {"answer": "".join(answer), "sources": sources}
 
     def reset_chain(self):
-        """Drop the cached chain so it rebuilds on next query."""
-        self._chain = None
\ No newline at end of file
+        """Drop the cached chain, vector store and answers so they rebuild on next query."""
+        self._chain = None
+        self._vs = None
+        self._reset_cache()
\ No newline at end of file
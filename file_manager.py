@@ -7,9 +7,13 @@ project root — no path traversal outside it is allowed.
 """
 
 import os
+import mmap
 from pathlib import Path
 from typing import Optional
 
+# Files larger than this are read through mmap
+MMAP_THRESHOLD = 1 << 20
+
 
 class FileManager:
     def __init__(self):
@@ -26,7 +30,7 @@ class FileManager:
         if not self._root:
             raise RuntimeError("No project indexed yet.")
         target = (self._root / relative_path).resolve()
-        if not str(target).startswith(str(self._root)):
+        if not target.is_relative_to(self._root):
             raise PermissionError(f"Path traversal blocked: {relative_path}")
         return target
 
@@ -38,25 +42,36 @@ class FileManager:
             raise RuntimeError("No project indexed yet.")
         return self._build_tree(self._root)
 
-    def _build_tree(self, path: Path) -> dict:
+    def _build_tree(self, root: Path) -> dict:
         IGNORE = {"node_modules", ".git", "__pycache__", ".venv", "venv",
                   "dist", "build", ".next", "vendor", "faiss_index"}
-        node = {
-            "name": path.name,
-            "path": str(path.relative_to(self._root)),
-            "type": "dir" if path.is_dir() else "file",
-        }
-        if path.is_dir():
-            children = []
+        prefix = len(str(root)) + 1
+        tree = {"name": root.name, "path": ".", "type": "dir", "children": []}
+        # Iterative walk; scandir entries carry the file type, so no extra stat() calls
+        stack = [(str(root), tree["children"])]
+        while stack:
+            dir_path, children = stack.pop()
             try:
-                for child in sorted(path.iterdir(), key=lambda p: (p.is_file(), p.name)):
-                    if child.name in IGNORE or child.name.startswith("."):
-                        continue
-                    children.append(self._build_tree(child))
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        if entry.name in IGNORE or entry.name.startswith("."):
+                            continue
+                        is_dir = entry.is_dir()
+                        node = {
+                            "name": entry.name,
+                            "path": entry.path[prefix:],
+                            "type": "dir" if is_dir else "file",
+                        }
+                        if is_dir:
+                            node["children"] = []
+                            # Symlinked dirs are listed but not descended, which avoids cycles
+                            if not entry.is_symlink():
+                                stack.append((entry.path, node["children"]))
+                        children.append(node)
             except PermissionError:
                 pass
-            node["children"] = children
-        return node
+            children.sort(key=lambda n: (n["type"] == "file", n["name"]))
+        return tree
 
     # ── Read ──────────────────────────────────────────────────────────────────
 
@@ -66,14 +81,30 @@ class FileManager:
             raise FileNotFoundError(f"File not found: {relative_path}")
         if not path.is_file():
             raise IsADirectoryError(f"Path is a directory: {relative_path}")
-        content = path.read_text(encoding="utf-8", errors="replace")
+        size = path.stat().st_size
+        if size > MMAP_THRESHOLD:
+            content, lines = self._read_large(path)
+        else:
+            content = path.read_text(encoding="utf-8", errors="replace")
+            lines = content.count("\n") + 1
         return {
             "path": relative_path,
             "content": content,
-            "lines": content.count("\n") + 1,
-            "size": path.stat().st_size,
+            "lines": lines,
+            "size": size,
         }
 
+    def _read_large(self, path: Path) -> tuple:
+        """Decode straight from a memory map instead of buffering the file first."""
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as buf:
+                content = str(buf, "utf-8", "replace")
+            has_cr = mm.find(b"\r") != -1
+        if has_cr:
+            # Match read_text's universal-newline translation
+            content = content.replace("\r\n", "\n").replace("\r", "\n")
+        return content, content.count("\n") + 1
+
     # ── Write (create or overwrite) ───────────────────────────────────────────
 
     def write_file(self, relative_path: str, content: str) -> dict:
@@ -3,9 +3,12 @@ AI Personal Codebase Assistant — main.py
 """
 
 import os
+import json as _json
 from typing import Optional
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse as FastAPIStreaming
 from pydantic import BaseModel
 import uvicorn
 
@@ -14,12 +17,24 @@ from assistant import CodebaseAssistant
 from file_manager import FileManager
 from project_generator import ProjectGenerator
 
-app = FastAPI(title="AI Codebase Assistant", version="2.0.0")
+# The indexer and assistant load the embedding model, so they are built at
+# startup rather than on import: spawned index workers re-import this module.
+indexer:   Optional[CodebaseIndexer] = None
+assistant: Optional[CodebaseAssistant] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global indexer, assistant
+    indexer   = CodebaseIndexer()
+    assistant = CodebaseAssistant(indexer)
+    yield
+
+
+app = FastAPI(title="AI Codebase Assistant", version="2.0.0", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True,
                    allow_methods=["*"], allow_headers=["*"])
 
-indexer   = CodebaseIndexer()
-assistant = CodebaseAssistant(indexer)
 fm        = FileManager()
 generator = ProjectGenerator()
 
@@ -69,12 +84,18 @@ async def index_codebase(req: IndexRequest):
 
 @app.post("/query")
 async def query_codebase(req: QueryRequest):
+    """Stream answer tokens, then the sources, as NDJSON (one JSON object per line)."""
     if not indexer.is_indexed():
         raise HTTPException(status_code=400, detail="No codebase indexed yet.")
-    try:
-        return await assistant.query(req.question, req.chat_history)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+    async def stream():
+        try:
+            async for event in assistant.query(req.question, req.chat_history):
+                yield _json.dumps(event) + "\n"
+        except Exception as e:
+            yield _json.dumps({"type": "error", "message": str(e)}) + "\n"
+
+    return FastAPIStreaming(stream(), media_type="application/x-ndjson")
 
 @app.delete("/index")
 def clear_index():
@@ -128,9 +149,6 @@ def rename_file(req: RenameRequest):
 
 # ── Project Generator ─────────────────────────────────────────────────────────
 
-from fastapi.responses import StreamingResponse as FastAPIStreaming
-import json as _json
-
 @app.post("/generate")
 async def generate_project(req: GenerateRequest):
     """Stream project generation events as NDJSON (one JSON object per line)."""
@@ -2,7 +2,7 @@
 ProjectGenerator: generates a complete project in two phases.
 
 Phase 1 — Plan: ask LLM for a file list (small JSON, never truncated)
-Phase 2 — Generate: ask LLM to write each file individually
+Phase 2 — Generate: ask LLM to write each file individually (concurrently)
 
 This avoids the "unterminated JSON" error caused by hitting max_tokens
 when trying to generate all files in a single response.
@@ -11,6 +11,7 @@ when trying to generate all files in a single response.
 import os
 import json
 import re
+import asyncio
 from pathlib import Path
 from openai import AsyncOpenAI
 
@@ -20,6 +21,9 @@ DOCKER_MODEL_BASE_URL = os.getenv(
 )
 DOCKER_MODEL_NAME = os.getenv("DOCKER_MODEL_NAME", "ai/llama3.2")
 
+# Max files generated at once (bounded by how many requests the server runs in parallel)
+GENERATE_CONCURRENCY = 8
+
 # ── Phase 1: get file plan ────────────────────────────────────────────────────
 PLAN_SYSTEM = """You are a software architect. Given a project description,
 return ONLY a JSON object listing the files to create. No explanation, no markdown.
@@ -49,17 +53,17 @@ Write real, working, production-quality code. Do not use placeholder comments li
 """
 
 
-def _clean_json(raw: str) -> str:
-    """Strip markdown fences and find the JSON object."""
-    raw = raw.strip()
-    raw = re.sub(r'^```(?:json)?\s*', '', raw)
-    raw = re.sub(r'\s*```$', '', raw)
-    # Find first { to last }
+_JSON_DECODER = json.JSONDecoder()
+_UNSAFE_NAME_CHARS = re.compile(r'[^\w\-]')
+
+
+def _parse_plan(raw: str) -> dict:
+    """Decode the first JSON object in raw, ignoring fences or chatter around it."""
     start = raw.find('{')
-    end = raw.rfind('}')
-    if start != -1 and end != -1:
-        raw = raw[start:end+1]
-    return raw.strip()
+    if start == -1:
+        raise json.JSONDecodeError("No JSON object found", raw, 0)
+    plan, _ = _JSON_DECODER.raw_decode(raw, start)
+    return plan
 
 
 class ProjectGenerator:
@@ -85,7 +89,7 @@ class ProjectGenerator:
         """
         Two-phase generation:
         1. Get a file plan (small JSON)
-        2. Generate each file individually (never truncated)
+        2. Generate each file individually (never truncated), several at once
         """
         output_path = Path(output_dir)
 
@@ -99,14 +103,14 @@ class ProjectGenerator:
         )
 
         try:
-            plan = json.loads(_clean_json(plan_raw))
+            plan = _parse_plan(plan_raw)
         except json.JSONDecodeError as e:
             raise ValueError(f"Could not parse project plan: {e}\nRaw: {plan_raw[:300]}")
 
         if "files" not in plan or not plan["files"]:
             raise ValueError("LLM returned no files in the project plan.")
 
-        project_name = re.sub(r'[^\w\-]', '-', plan.get("project_name", "new-project")).strip('-')
+        project_name = _UNSAFE_NAME_CHARS.sub('-', plan.get("project_name", "new-project")).strip('-')
         project_dir  = (output_path / project_name).resolve()
         project_dir.mkdir(parents=True, exist_ok=True)
 
@@ -119,20 +123,16 @@ class ProjectGenerator:
                "total_files": total,
                "project_path": str(project_dir)}
 
-        # ── Phase 2: Generate each file ───────────────────────────────────────
-        written = []
-        for i, f in enumerate(files_list):
-            rel_path = f.get("path", "").lstrip("/").lstrip("\\")
-            purpose  = f.get("purpose", "")
-            if not rel_path:
-                continue
-
-            yield {"type": "generating", "file": rel_path, "index": i+1, "total": total}
+        # ── Phase 2: Generate files concurrently ──────────────────────────────
+        all_paths = chr(10).join(x['path'] for x in files_list)
+        sem = asyncio.Semaphore(GENERATE_CONCURRENCY)
 
-            try:
-                content = await self._chat(
-                    FILE_SYSTEM,
-                    f"""Project: {description}
+        async def gen_one(rel_path: str, purpose: str):
+            async with sem:
+                try:
+                    content = await self._chat(
+                        FILE_SYSTEM,
+                        f"""Project: {description}
 Tech stack: {plan.get('tech_stack', '')}
 Project name: {project_name}
 
@@ -141,22 +141,46 @@ Path: {rel_path}
 Purpose: {purpose}
 
 All other files in this project:
-{chr(10).join(x['path'] for x in files_list)}
+{all_paths}
 """,
-                    max_tokens=2048,
-                )
-
-                # Write to disk
-                full_path = (project_dir / rel_path).resolve()
-                if not str(full_path).startswith(str(project_dir)):
-                    continue  # block traversal
-                full_path.parent.mkdir(parents=True, exist_ok=True)
-                full_path.write_text(content, encoding="utf-8")
-                written.append(rel_path)
-                yield {"type": "file_done", "file": rel_path}
-
-            except Exception as e:
-                yield {"type": "file_error", "file": rel_path, "error": str(e)}
+                        max_tokens=2048,
+                    )
+                    return rel_path, content, None
+                except Exception as e:
+                    return rel_path, None, e
+
+        tasks = []
+        for f in files_list:
+            rel_path = f.get("path", "").lstrip("/").lstrip("\\")
+            if rel_path:
+                tasks.append(asyncio.create_task(gen_one(rel_path, f.get("purpose", ""))))
+
+        written = []
+        try:
+            for i, next_done in enumerate(asyncio.as_completed(tasks)):
+                rel_path, content, error = await next_done
+                yield {"type": "generating", "file": rel_path, "index": i+1, "total": total}
+
+                if error is not None:
+                    yield {"type": "file_error", "file": rel_path, "error": str(error)}
+                    continue
+
+                try:
+                    # Write to disk
+                    full_path = (project_dir / rel_path).resolve()
+                    if not full_path.is_relative_to(project_dir):
+                        continue  # block traversal
+                    full_path.parent.mkdir(parents=True, exist_ok=True)
+                    full_path.write_text(content, encoding="utf-8")
+                    written.append(rel_path)
+                    yield {"type": "file_done", "file": rel_path}
+
+                except Exception as e:
+                    yield {"type": "file_error", "file": rel_path, "error": str(e)}
+        finally:
+            # Client disconnected mid-stream: don't leave LLM calls running
+            for t in tasks:
+                t.cancel()
 
         yield {
             "type": "done",